@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 import os
+import re
 import io
 import csv
 import json
 import math
+import pickle
+import threading
+import itertools
+import bisect
+from collections import ChainMap
 from datetime import datetime
 from functools import wraps
 
@@ -11,12 +17,16 @@ from flask import (
     Flask, render_template, request, jsonify, redirect, url_for, session,
     send_file, Response, flash, abort
 )
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import (
     LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 )
 from authlib.integrations.flask_client import OAuth
+import click
 import requests
+from requests.adapters import HTTPAdapter
+from cachetools import TTLCache
 
 # Optional: PDF generation via reportlab
 try:
@@ -26,6 +36,13 @@ try:
 except Exception:
     REPORTLAB_AVAILABLE = False
 
+# Optional: faster JSON parsing via orjson
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    ORJSON_AVAILABLE = False
+
 # ---------- App & Config ----------
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-change-me")
@@ -33,6 +50,44 @@ app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:/
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Serializes with orjson for jsonify() and the session cookie.
+    Calls with options orjson doesn't support fall back to stdlib json.
+    Dates still go through Flask's default (HTTP-date strings), but
+    non-ASCII text is emitted as UTF-8 rather than \\u escapes since
+    orjson has no ensure_ascii mode.
+    """
+    def dumps(self, obj, **kwargs):
+        if not self._orjson_can_dump(kwargs):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    @staticmethod
+    def _orjson_can_dump(kwargs):
+        # orjson only does compact output (what jsonify and the session
+        # serializer request) or a 2-space indent (jsonify in debug mode)
+        if kwargs.keys() - {"indent", "separators", "sort_keys"}:
+            return False
+        indent = kwargs.get("indent")
+        separators = kwargs.get("separators")
+        if indent:
+            return indent == 2 and separators is None
+        return separators == (",", ":")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = "index"
@@ -40,17 +95,23 @@ login_manager.login_view = "index"
 # ---------- User model ----------
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(320), unique=True, nullable=False)
+    email = db.Column(db.String(320), unique=True, nullable=False, index=True)
     name = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+@app.cli.command("init-db")
+def init_db():
+    """Create database tables (run once per deployment: `flask init-db`)."""
+    db.create_all()
+    click.echo("Initialized the database.")
+
 with app.app_context():
     db.create_all()
 
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        return User.query.get(int(user_id))
+        return db.session.get(User, int(user_id))
     except Exception:
         return None
 
@@ -63,10 +124,18 @@ google = oauth.register(
     server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
     client_kwargs={"scope": "openid email profile"},
 )
+# Shared HTTP session so outbound API calls reuse pooled keep-alive connections
+_HTTP = requests.Session()
+_HTTP.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
 # ---------- Fish data helpers ----------
 def fish_data_path():
     return os.path.join(app.root_path, "static", "fish_data.json")
 
+def fish_pickle_path():
+    # kept out of static/ so the pre-normalized cache is never served
+    return os.path.join(app.instance_path, "fish_data.pkl")
+
 def get_num(v, fallback=None):
     try:
         if v is None:
@@ -88,20 +157,33 @@ def get_range(item, key, default):
         return [low, high]
     return default
 
-def load_fish_data():
+# Species whose waste load warrants extra tank volume (matched on name)
+MESSY_NAMES = ("goldfish", "oscar", "koi", "pleco")
+MESSY_RE = re.compile("|".join(MESSY_NAMES), re.IGNORECASE)
+
+# Parsed fish data is cached per process and only re-read when the file's
+# mtime changes. Callers must treat the returned dicts as read-only.
+_EMPTY_FISH_CACHE = {
+    "mtime": None, "data": [], "by_id": {}, "lower_names": [], "select2_rows": [],
+    "sorted_keys": [], "sorted_idx": [],
+}
+_FISH_CACHE = _EMPTY_FISH_CACHE
+_FISH_CACHE_LOCK = threading.Lock()
+# Bump when _parse_fish_data's output changes so stale pickles are rebuilt.
+# Heuristic fields (see _add_derived_fields) are never pickled.
+FISH_PICKLE_VERSION = 2
+
+def _parse_fish_data(path):
     """
     Loads and normalizes fish_data.json.
-    Returns list of fish dicts with stable keys.
+    Returns list of fish dicts with stable keys, or None if the file
+    could not be parsed.
     """
-    path = fish_data_path()
-    if not os.path.exists(path):
-        return []
-
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         try:
-            raw = json.load(f)
+            raw = orjson.loads(f.read()) if ORJSON_AVAILABLE else json.load(f)
         except Exception:
-            return []
+            return None
 
     normalized = []
     for item in raw:
@@ -111,10 +193,11 @@ def load_fish_data():
             continue
 
         compat_raw = item.get("compatibility") or item.get("compat") or []
-        compatibility = [str(x) for x in compat_raw]
+        compatibility_set = frozenset(map(str, compat_raw))
 
         min_tank_size = get_num(item.get("min_tank_size"), None) or get_num(item.get("minTankSize"), None)
-        adult_size = get_num(item.get("adult_size"), get_num(item.get("avg_size"), None)) or get_num(item.get("avg_size"), None)
+        avg_size = get_num(item.get("avg_size"), None)
+        adult_size = get_num(item.get("adult_size"), avg_size) or avg_size
 
         temperature = get_range(item, "temperature", [22.0, 26.0])
         ph = get_range(item, "ph", [6.5, 7.5])
@@ -134,7 +217,8 @@ def load_fish_data():
         normalized.append({
             "id": fid,
             "name": name,
-            "compatibility": compatibility,
+            "name_lower": name.lower(),
+            "compatibility_set": compatibility_set,
             "min_tank_size": float(min_tank_size) if min_tank_size is not None else None,
             "adult_size": float(adult_size) if adult_size is not None else None,
             "temperature": [float(temperature[0]), float(temperature[1])],
@@ -149,11 +233,128 @@ def load_fish_data():
 
     return normalized
 
-def build_fish_map():
-    fishes = load_fish_data()
-    return {f["id"]: f for f in fishes}
+def _add_derived_fields(fish):
+    """
+    Adds the heuristic flags and per-fish tank cost to a normalized record.
+    Kept out of the pickle so edits to MESSY_NAMES or the waste factors
+    take effect on the next load.
+    """
+    fish["is_aggressive"] = "aggressive" in str(fish["temperament"]).lower()
+    fish["is_messy"] = MESSY_RE.search(fish["name"]) is not None
+
+    # Litres each individual adds to the tank estimate (see estimate_tank_size_litres)
+    waste_factor = 1.0
+    if fish["is_aggressive"]:
+        waste_factor += 0.25
+    if fish["is_messy"]:
+        waste_factor += 0.6
+    fish["tank_cost"] = 0.5 * float(fish["adult_size"] or 5.0) * waste_factor
+    return fish
+
+def _build_cache(path, source_key):
+    """
+    Parses fish_data.json and writes the normalized list to fish_data.pkl,
+    tagged with the JSON's (st_mtime_ns, st_size), so the next process start
+    can skip JSON parsing and normalization. A failed parse is not persisted.
+    """
+    fishes = _parse_fish_data(path)
+    if fishes is None:
+        return []
+    pkl_path = fish_pickle_path()
+    tmp_path = f"{pkl_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(pkl_path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump((FISH_PICKLE_VERSION, source_key, fishes), f, protocol=5)
+        os.replace(tmp_path, pkl_path)
+    except OSError:
+        pass
+    return fishes
+
+def _read_fish_data(path, st):
+    """
+    Loads the pickled fish list if it was built from exactly this version
+    of fish_data.json (same mtime and size), else rebuilds it.
+    """
+    source_key = (st.st_mtime_ns, st.st_size)
+    try:
+        with open(fish_pickle_path(), "rb") as f:
+            version, pickled_key, fishes = pickle.load(f)
+        if version == FISH_PICKLE_VERSION and pickled_key == source_key:
+            return fishes
+    except Exception:
+        pass
+    return _build_cache(path, source_key)
+
+def _get_fish_cache():
+    """
+    Returns the current fish cache dict, refilling it only when
+    fish_data.json's mtime differs from the cached one. Concurrent
+    requests that miss together wait on the lock and share one refill.
+    """
+    global _FISH_CACHE
+    path = fish_data_path()
+    try:
+        st = os.stat(path)
+    except OSError:
+        return _EMPTY_FISH_CACHE
+    mtime = st.st_mtime_ns
+
+    cache = _FISH_CACHE
+    if cache["mtime"] == mtime:
+        return cache
+
+    with _FISH_CACHE_LOCK:
+        cache = _FISH_CACHE
+        if cache["mtime"] != mtime:
+            fishes = [_add_derived_fields(f) for f in _read_fish_data(path, st)]
+            # swap in a whole new dict so readers never see a half-built cache
+            cache = {
+                "mtime": mtime,
+                "data": fishes,
+                "by_id": {f["id"]: f for f in fishes},
+                "lower_names": [f["name_lower"] for f in fishes],
+                # prebuilt Select2 {id, text} rows, parallel to fishes
+                "select2_rows": [{"id": f["id"], "text": f["name"]} for f in fishes],
+            }
+            # alphabetical prefix index: sorted_keys[k] is the name of fishes[sorted_idx[k]]
+            cache["sorted_idx"] = sorted(range(len(fishes)), key=cache["lower_names"].__getitem__)
+            cache["sorted_keys"] = [cache["lower_names"][i] for i in cache["sorted_idx"]]
+            _FISH_CACHE = cache
+        return cache
+
+def get_fish():
+    """
+    Returns (fishes, id -> fish dict, version) from the same cached snapshot.
+    version is the snapshot's mtime, for keying anything derived from it.
+    """
+    cache = _get_fish_cache()
+    return cache["data"], cache["by_id"], cache["mtime"]
+
+def search_fish_indices(cache, q):
+    """
+    Yields indices into cache["data"] whose lowercased name contains q.
+    Prefix matches come first (alphabetical, found by bisect on the sorted
+    index), followed by the remaining substring matches in file order.
+    """
+    keys = cache["sorted_keys"]
+    lo = bisect.bisect_left(keys, q)
+    # truncating sorted keys to len(q) keeps them sorted, so this finds the
+    # end of the run of names that start with q
+    hi = bisect.bisect_right(keys, q, lo, key=lambda k: k[:len(q)])
+    prefix = cache["sorted_idx"][lo:hi]
+    yield from prefix
+    prefix = set(prefix)
+    for i, nl in enumerate(cache["lower_names"]):
+        if q in nl and i not in prefix:
+            yield i
 
 # ---------- Select2 API (search + pagination + id prefetch) ----------
+# Search pages are the same for every user, so they are cached by
+# (fish data mtime, query, page) and reused across Select2 keystrokes.
+_SEARCH_PAGE_CACHE = TTLCache(maxsize=512, ttl=900)
+_SEARCH_PAGE_CACHE_LOCK = threading.Lock()
+
 @app.route("/fish_data")
 @login_required
 def fish_data_api():
@@ -162,54 +363,64 @@ def fish_data_api():
       - ?id=123  -> returns item with that id (for Select2 prepopulation)
       - ?q=term&page=1 -> paginated search for Select2
     """
-    fishes = load_fish_data()
-
     fid = request.args.get("id")
     if fid:
-        it = next((f for f in fishes if f["id"] == str(fid)), None)
+        _, fish_map, _ = get_fish()
+        it = fish_map.get(str(fid))
         if not it:
             return jsonify({"items": []})
         return jsonify({"items": [{"id": it["id"], "text": it["name"]}], "more": False})
 
     q = (request.args.get("q") or "").strip().lower()
-    page = int(request.args.get("page") or 1)
+    page = max(1, int(request.args.get("page") or 1))
     per_page = 20
 
-    if q:
-        fishes = [f for f in fishes if q in f["name"].lower()]
+    cache = _get_fish_cache()
+    page_key = (cache["mtime"], q, page)
+    with _SEARCH_PAGE_CACHE_LOCK:
+        payload = _SEARCH_PAGE_CACHE.get(page_key)
+    if payload is not None:
+        return jsonify(payload)
 
-    total = len(fishes)
+    rows = cache["select2_rows"]
     start = (page - 1) * per_page
     end = start + per_page
-    page_items = fishes[start:end]
-    more = end < total
+    # take one extra match past the page to learn whether more exist
+    if q:
+        window = [rows[i] for i in itertools.islice(search_fish_indices(cache, q), start, end + 1)]
+    else:
+        window = rows[start:end + 1]
 
-    items = [{"id": f["id"], "text": f["name"]} for f in page_items]
-    return jsonify({"items": items, "more": more})
+    items = window[:per_page]
+    more = len(window) > per_page
+
+    payload = {"items": items, "more": more}
+    with _SEARCH_PAGE_CACHE_LOCK:
+        _SEARCH_PAGE_CACHE[page_key] = payload
+    return jsonify(payload)
 
 # ---------- Core compute utilities ----------
+# Pair label indexed by how many of the two species list the other as compatible
+PAIR_LABELS = ("incompatible", "semi-compatible", "compatible")
+
 def pairwise_compatibility_matrix(fishes):
     """
     fishes: list of species dicts (one entry per species, counts ignored)
     returns n x n matrix with 'compatible'|'semi-compatible'|'incompatible'|'self'
     """
     n = len(fishes)
+    ids = [f["id"] for f in fishes]
+    # likes[i][j] is True when species i lists species j as compatible
+    likes = [[fid in f["compatibility_set"] for fid in ids] for f in fishes]
+
     matrix = [[None] * n for _ in range(n)]
     for i in range(n):
-        for j in range(n):
-            if i == j:
-                matrix[i][j] = "self"
-                continue
-            id_i = fishes[i]["id"]
-            id_j = fishes[j]["id"]
-            i_list = fishes[i].get("compatibility", []) or []
-            j_list = fishes[j].get("compatibility", []) or []
-            if id_j in i_list and id_i in j_list:
-                matrix[i][j] = "compatible"
-            elif id_j in i_list or id_i in j_list:
-                matrix[i][j] = "semi-compatible"
-            else:
-                matrix[i][j] = "incompatible"
+        matrix[i][i] = "self"
+    # the label only depends on the unordered pair, so fill i < j and mirror
+    for i in range(n):
+        row = likes[i]
+        for j in range(i + 1, n):
+            matrix[i][j] = matrix[j][i] = PAIR_LABELS[row[j] + likes[j][i]]
     return matrix
 
 def compute_range_overlap(ranges):
@@ -217,45 +428,65 @@ def compute_range_overlap(ranges):
     ranges: list of [low, high]
     returns (low, high, ok_bool)
     """
-    low = max(r[0] for r in ranges)
-    high = min(r[1] for r in ranges)
+    lows, highs = zip(*ranges)
+    low = max(lows)
+    high = min(highs)
     return (low, high, low <= high)
 
-def estimate_tank_size_litres(fishes_expanded):
+WATER_PARAMS = ("temperature", "ph", "hardness")
+
+def compute_overlaps(fishes):
+    """
+    fishes: list of species dicts
+    returns dict of water parameter -> (low, high, ok_bool)
     """
-    fishes_expanded: list of fish dicts repeated by count
+    return {key: compute_range_overlap([f[key] for f in fishes]) for key in WATER_PARAMS}
+
+def estimate_tank_size_litres(selected_species):
+    """
+    selected_species: list of species dicts (one per species) with 'count'
     Heuristic:
       - base: max(min_tank_size) present among species (or 10 L)
       - extra: sum(0.5 * adult_size(cm)) per fish * waste factors
-      - schooling accounted because expansion lists each fish individually
+        (precomputed per species as 'tank_cost' at load time)
+      - schooling accounted because each species' cost is scaled by its count
       - final: rounded up to nearest 5 L
     """
-    # compute base from unique species if present
-    unique_min = [f.get("min_tank_size") for f in fishes_expanded if f.get("min_tank_size")]
+    unique_min = [f.get("min_tank_size") for f in selected_species if f.get("min_tank_size")]
     base = float(max(unique_min)) if unique_min else 10.0
 
-    extra = 0.0
-    for f in fishes_expanded:
-        adult_cm = f.get("adult_size") or 5.0
-        per_fish = 0.5 * float(adult_cm)
-        waste_factor = 1.0
-        temp_str = f.get("temperament", "").lower()
-        if "aggressive" in temp_str:
-            waste_factor += 0.25
-        name_l = f.get("name", "").lower()
-        if any(x in name_l for x in ["goldfish", "oscar", "koi", "pleco"]):
-            waste_factor += 0.6
-        extra += per_fish * waste_factor
+    extra = sum(f["tank_cost"] * int(f.get("count", 1)) for f in selected_species)
 
     # buffer
     recommended = max(base, extra + base * 0.15)
     recommended = math.ceil(recommended / 5.0) * 5
     return int(recommended)
 
-def collect_warnings(selected_species, matrix, overlaps):
+def summarize_pairs(matrix):
+    """
+    Walks the upper triangle of the species-level matrix once.
+    returns (compatible_count, semi_count, incompatible index pairs)
+    """
+    compatible_pairs = 0
+    semi_pairs = 0
+    incompatible = []
+    n = len(matrix)
+    for i in range(n):
+        row = matrix[i]
+        for j in range(i + 1, n):
+            label = row[j]
+            if label == "compatible":
+                compatible_pairs += 1
+            elif label == "semi-compatible":
+                semi_pairs += 1
+            elif label == "incompatible":
+                incompatible.append((i, j))
+    return compatible_pairs, semi_pairs, incompatible
+
+def collect_warnings(selected_species, incompatible, overlaps):
     """
     selected_species: list of species dicts (one per species) with 'count'
-    matrix: species-level pairwise matrix
+    incompatible: (i, j) index pairs from summarize_pairs
     overlaps: dict with temperature/ph/hardness tuples
     Returns a summarized list of warning strings.
     """
@@ -282,23 +513,70 @@ def collect_warnings(selected_species, matrix, overlaps):
 
     # Incompatible pairs at species-level (no repeats)
     incompatible_pairs = set()
-    n = len(selected_species)
-    for i in range(n):
-        for j in range(i + 1, n):
-            if matrix[i][j] == "incompatible":
-                pair = tuple(sorted([selected_species[i]["name"], selected_species[j]["name"]]))
-                incompatible_pairs.add(pair)
+    for i, j in incompatible:
+        a, b = selected_species[i]["name"], selected_species[j]["name"]
+        incompatible_pairs.add((a, b) if a < b else (b, a))
     if incompatible_pairs:
         formatted = "; ".join([f"{a} × {b}" for a, b in sorted(incompatible_pairs)])
         warnings.append(f"Incompatible pairs: {formatted}")
 
     # Multiple aggressive species
-    aggressive = [f["name"] for f in selected_species if "aggressive" in (f.get("temperament","").lower())]
+    aggressive = [f["name"] for f in selected_species if f.get("is_aggressive")]
     if len(aggressive) > 1:
         warnings.append("Multiple aggressive/territorial species selected: " + ", ".join(aggressive))
 
     return warnings
 
+# Finished reports keyed by fish data version + (id, count) selection, so a
+# /download_report right after /compute only has to format the result.
+_REPORT_CACHE = TTLCache(maxsize=256, ttl=900)
+_REPORT_CACHE_LOCK = threading.Lock()
+
+def build_report(fish_version, selected_species):
+    """
+    fish_version: mtime of the fish cache snapshot selected_species came from
+    selected_species: list of species dicts (one per species) with 'count'
+    Returns dict with matrix, overlaps, tank_l, tank_gal, warnings and score.
+    The returned dict is shared between requests and must not be mutated.
+    """
+    key = (fish_version, tuple((f["id"], f["count"]) for f in selected_species))
+    with _REPORT_CACHE_LOCK:
+        report = _REPORT_CACHE.get(key)
+    if report is not None:
+        return report
+
+    # species-level matrix
+    matrix = pairwise_compatibility_matrix(selected_species)
+
+    # parameter overlaps (species-level)
+    overlaps = compute_overlaps(selected_species)
+
+    # tank size (counts matter)
+    tank_l = estimate_tank_size_litres(selected_species)
+    tank_gal = round(tank_l * 0.264172, 1)
+
+    compatible_pairs, semi_pairs, incompatible = summarize_pairs(matrix)
+
+    # warnings (species-level)
+    warnings = collect_warnings(selected_species, incompatible, overlaps)
+
+    # compatibility score (species-level)
+    n = len(selected_species)
+    total_pairs = n * (n - 1) / 2 if n > 1 else 1
+    score = int(100 * (compatible_pairs + 0.5 * semi_pairs) / total_pairs) if total_pairs > 0 else 100
+
+    report = {
+        "matrix": matrix,
+        "overlaps": overlaps,
+        "tank_l": tank_l,
+        "tank_gal": tank_gal,
+        "warnings": warnings,
+        "score": score,
+    }
+    with _REPORT_CACHE_LOCK:
+        _REPORT_CACHE[key] = report
+    return report
+
 # ---------- Routes ----------
 @app.route("/")
 def index():
@@ -313,8 +591,12 @@ def login():
 @app.route("/authorize")
 def authorize():
     token = google.authorize_access_token()
-    resp = google.get("https://openidconnect.googleapis.com/v1/userinfo", token=token)
-    info = resp.json() if resp else {}
+    # the validated OpenID id_token already carries the claims; only fall back
+    # to the userinfo endpoint (an extra round-trip) when it is missing
+    info = token.get("userinfo")
+    if not info:
+        resp = google.get("https://openidconnect.googleapis.com/v1/userinfo", token=token)
+        info = resp.json() if resp else {}
     email = info.get("email")
     name = info.get("name") or email
     if not email:
@@ -346,29 +628,23 @@ def dashboard():
 @app.route("/compute", methods=["GET", "POST"])
 @login_required
 def compute():
-    fishes_all = load_fish_data()
-
     if request.method == "POST":
         selected_ids = request.form.getlist("fish_ids[]")
         selected_counts = request.form.getlist("fish_counts[]")
 
-        id_map = {f["id"]: f for f in fishes_all}
+        _, id_map, fish_version = get_fish()
         selected_species = []   # one entry per species with .count
-        expanded = []           # repeated entries by count for tank calc
 
         for fid, count_str in zip(selected_ids, selected_counts):
-            if fid in id_map:
-                base = id_map[fid]
-                try:
-                    count = max(1, int(count_str or "1"))
-                except Exception:
-                    count = 1
-                fish_copy = base.copy()
-                fish_copy["count"] = count
-                selected_species.append(fish_copy)
-                # expanded uses base (without count) repeated
-                for _ in range(count):
-                    expanded.append(base)
+            base = id_map.get(fid)
+            if base is None:
+                continue
+            try:
+                count = max(1, int(count_str or "1"))
+            except Exception:
+                count = 1
+            # cached base dicts are shared, so layer the count on top
+            selected_species.append(ChainMap({"count": count}, base))
 
         if not selected_species:
             return render_template("compute.html",
@@ -376,59 +652,28 @@ def compute():
                                    selected_ids=selected_ids,
                                    selected_counts=selected_counts)
 
-        # species-level matrix
-        matrix = pairwise_compatibility_matrix(selected_species)
-
-        # parameter overlaps (species-level)
-        temp_ranges = [f.get("temperature", [22, 26]) for f in selected_species]
-        ph_ranges = [f.get("ph", [6.5, 7.5]) for f in selected_species]
-        hard_ranges = [f.get("hardness", [1, 12]) for f in selected_species]
-        overlaps = {
-            "temperature": compute_range_overlap(temp_ranges),
-            "ph": compute_range_overlap(ph_ranges),
-            "hardness": compute_range_overlap(hard_ranges)
-        }
-
-        # tank size using expanded list (counts matter)
-        tank_l = estimate_tank_size_litres(expanded)
-        tank_gal = round(tank_l * 0.264172, 1)
-
-        # warnings (species-level)
-        warnings = collect_warnings(selected_species, matrix, overlaps)
-
-        # compatibility score (species-level)
-        n = len(selected_species)
-        total_pairs = n * (n - 1) / 2 if n > 1 else 1
-        compatible_pairs = 0
-        semi_pairs = 0
-        for i in range(n):
-            for j in range(i + 1, n):
-                if matrix[i][j] == "compatible":
-                    compatible_pairs += 1
-                elif matrix[i][j] == "semi-compatible":
-                    semi_pairs += 1
-        score = int(100 * (compatible_pairs + 0.5 * semi_pairs) / total_pairs) if total_pairs > 0 else 100
+        report = build_report(fish_version, selected_species)
 
         # persist last report in session for dashboard download
         session["last_report"] = {
             "selected_ids": selected_ids,
             "selected_counts": selected_counts,
             "fishes": [{"id": f["id"], "name": f["name"], "count": f["count"]} for f in selected_species],
-            "tank_l": tank_l,
-            "tank_gal": tank_gal,
-            "score": score,
+            "tank_l": report["tank_l"],
+            "tank_gal": report["tank_gal"],
+            "score": report["score"],
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
 
         return render_template(
             "result.html",
             fishes=selected_species,
-            matrix=matrix,
-            tank_l=tank_l,
-            tank_gal=tank_gal,
-            overlaps=overlaps,
-            warnings=warnings,
-            score=score,
+            matrix=report["matrix"],
+            tank_l=report["tank_l"],
+            tank_gal=report["tank_gal"],
+            overlaps=report["overlaps"],
+            warnings=report["warnings"],
+            score=report["score"],
             selected_ids=selected_ids,
             selected_counts=selected_counts
         )
@@ -445,6 +690,11 @@ def compute():
     return render_template("compute.html", selected_ids=selected_ids, selected_counts=selected_counts)
 
 # Download report
+class Echo:
+    """File-like shim so csv.writer returns each formatted row instead of buffering it."""
+    def write(self, value):
+        return value
+
 @app.route("/download_report", methods=["POST"])
 @login_required
 def download_report():
@@ -452,78 +702,64 @@ def download_report():
     selected_ids = request.form.getlist("fish_ids[]")
     selected_counts = request.form.getlist("fish_counts[]")
 
-    fishes_all = load_fish_data()
-    id_map = {f["id"]: f for f in fishes_all}
+    _, id_map, fish_version = get_fish()
 
     selected_species = []
-    expanded = []
     for fid, count_str in zip(selected_ids, selected_counts):
-        if fid in id_map:
-            base = id_map[fid]
-            try:
-                count = max(1, int(count_str or "1"))
-            except Exception:
-                count = 1
-            fcopy = base.copy()
-            fcopy["count"] = count
-            selected_species.append(fcopy)
-            for _ in range(count):
-                expanded.append(base)
+        base = id_map.get(fid)
+        if base is None:
+            continue
+        try:
+            count = max(1, int(count_str or "1"))
+        except Exception:
+            count = 1
+        selected_species.append(ChainMap({"count": count}, base))
 
     if not selected_species:
         flash("No fishes selected for download.", "warning")
         return redirect(url_for("compute"))
 
-    # species-level data for report
-    matrix = pairwise_compatibility_matrix(selected_species)
-    temp_ranges = [f.get("temperature", [22, 26]) for f in selected_species]
-    ph_ranges = [f.get("ph", [6.5, 7.5]) for f in selected_species]
-    hard_ranges = [f.get("hardness", [1, 12]) for f in selected_species]
-    overlaps = {
-        "temperature": compute_range_overlap(temp_ranges),
-        "ph": compute_range_overlap(ph_ranges),
-        "hardness": compute_range_overlap(hard_ranges)
-    }
-    tank_l = estimate_tank_size_litres(expanded)
-    tank_gal = round(tank_l * 0.264172, 1)
-    warnings = collect_warnings(selected_species, matrix, overlaps)
+    # species-level data for report (usually already computed by /compute)
+    report = build_report(fish_version, selected_species)
+    overlaps = report["overlaps"]
+    tank_l = report["tank_l"]
+    tank_gal = report["tank_gal"]
+    warnings = report["warnings"]
 
     if fmt == "csv":
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["Fish Compatibility Report"])
-        writer.writerow([f"Generated: {datetime.utcnow().isoformat()} UTC"])
-        writer.writerow([])
-        writer.writerow(["id", "name", "count", "adult_size_cm", "min_tank_size_L", "temp_min", "temp_max", "ph_min", "ph_max", "hardness_min", "hardness_max", "temperament", "diet", "schooling", "min_group_size"])
-        for f in selected_species:
-            writer.writerow([
-                f.get("id", ""),
-                f.get("name", ""),
-                f.get("count", 1),
-                f.get("adult_size", ""),
-                f.get("min_tank_size", ""),
-                f.get("temperature", [None, None])[0], f.get("temperature", [None, None])[1],
-                f.get("ph", [None, None])[0], f.get("ph", [None, None])[1],
-                f.get("hardness", [None, None])[0], f.get("hardness", [None, None])[1],
-                f.get("temperament", ""), f.get("diet", ""), f.get("schooling", False), f.get("min_group_size", 1)
-            ])
-        writer.writerow([])
-        writer.writerow(["Tank recommendation (L)", tank_l])
-        writer.writerow(["Tank recommendation (gal)", tank_gal])
-        writer.writerow([])
-        t = overlaps["temperature"]; p = overlaps["ph"]; h = overlaps["hardness"]
-        writer.writerow(["Temperature overlap", t[0], t[1], t[2]])
-        writer.writerow(["pH overlap", p[0], p[1], p[2]])
-        writer.writerow(["Hardness overlap", h[0], h[1], h[2]])
-        writer.writerow([])
-        writer.writerow(["Warnings"])
-        for w in warnings:
-            writer.writerow([w])
+        def generate():
+            writer = csv.writer(Echo())
+            yield writer.writerow(["Fish Compatibility Report"])
+            yield writer.writerow([f"Generated: {datetime.utcnow().isoformat()} UTC"])
+            yield writer.writerow([])
+            yield writer.writerow(["id", "name", "count", "adult_size_cm", "min_tank_size_L", "temp_min", "temp_max", "ph_min", "ph_max", "hardness_min", "hardness_max", "temperament", "diet", "schooling", "min_group_size"])
+            for f in selected_species:
+                yield writer.writerow([
+                    f.get("id", ""),
+                    f.get("name", ""),
+                    f.get("count", 1),
+                    f.get("adult_size", ""),
+                    f.get("min_tank_size", ""),
+                    f.get("temperature", [None, None])[0], f.get("temperature", [None, None])[1],
+                    f.get("ph", [None, None])[0], f.get("ph", [None, None])[1],
+                    f.get("hardness", [None, None])[0], f.get("hardness", [None, None])[1],
+                    f.get("temperament", ""), f.get("diet", ""), f.get("schooling", False), f.get("min_group_size", 1)
+                ])
+            yield writer.writerow([])
+            yield writer.writerow(["Tank recommendation (L)", tank_l])
+            yield writer.writerow(["Tank recommendation (gal)", tank_gal])
+            yield writer.writerow([])
+            t = overlaps["temperature"]; p = overlaps["ph"]; h = overlaps["hardness"]
+            yield writer.writerow(["Temperature overlap", t[0], t[1], t[2]])
+            yield writer.writerow(["pH overlap", p[0], p[1], p[2]])
+            yield writer.writerow(["Hardness overlap", h[0], h[1], h[2]])
+            yield writer.writerow([])
+            yield writer.writerow(["Warnings"])
+            for w in warnings:
+                yield writer.writerow([w])
 
-        csv_data = output.getvalue().encode("utf-8")
-        output.close()
         return Response(
-            csv_data,
+            generate(),
             mimetype="text/csv",
             headers={"Content-Disposition": f"attachment;filename=fish_report_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"}
         )
@@ -602,6 +838,12 @@ def download_report():
         return "Unknown format", 400
 
 # ---------- Ask AI route (preserve fallback) ----------
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+
+# Gemini answers keyed by normalized question, so repeat questions skip the API call
+_ASK_CACHE = TTLCache(maxsize=1024, ttl=3600)
+_ASK_CACHE_LOCK = threading.Lock()
+
 @app.route("/ask")
 @login_required
 def ask():
@@ -616,14 +858,19 @@ def ask():
             return jsonify({"answer": fallback + "Bettas and goldfish are not ideal tankmates due to temp and behavior differences."})
         return jsonify({"answer": fallback + "Ask about tank mates, water params, diet, or care tips."})
 
+    cache_key = question.lower()
+    with _ASK_CACHE_LOCK:
+        cached = _ASK_CACHE.get(cache_key)
+    if cached is not None:
+        return jsonify({"answer": cached})
+
     try:
-        url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
         payload = {
             "contents": [{
                 "parts": [{"text": f"You are an aquarium assistant. Answer briefly: {question}"}]
             }]
         }
-        r = requests.post(f"{url}?key={api_key}", json=payload, timeout=20)
+        r = _HTTP.post(GEMINI_URL, params={"key": api_key}, json=payload, timeout=(3, 20))
         r.raise_for_status()
         data = r.json()
         txt = (
@@ -634,6 +881,9 @@ def ask():
         )
         if not txt:
             txt = "I couldn't get a response right now."
+        else:
+            with _ASK_CACHE_LOCK:
+                _ASK_CACHE[cache_key] = txt
         return jsonify({"answer": txt})
     except Exception as e:
         return jsonify({"answer": f"AI error: {e}"})